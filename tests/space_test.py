@@ -24,20 +24,19 @@ from absl.testing import absltest
 from absl.testing import parameterized
 
 from jax.config import config as jax_config
+from jax import lax
 from jax import random
 import jax.numpy as np
 
-from jax.api import grad
+from jax.api import jit, grad, vmap
 
 from jax import test_util as jtu
 
-from jax_md import space, test_util
+from jax_md import space
 from jax_md.util import *
 
 from functools import partial
 
-test_util.update_test_tolerance(5e-5, 5e-13)
-
 jax_config.parse_flags_with_absl()
 FLAGS = jax_config.FLAGS
 
@@ -52,21 +51,125 @@ else:
   POSITION_DTYPE = [f32]
 
 
+# PRNG key material is generated once at module scope and shared by every
+# test method (and across the dim / dtype parameterizations); tests slice off
+# the keys they need instead of re-deriving them from a fresh PRNGKey.
+KEYS = random.split(random.PRNGKey(0), 128)
+
+
+# The minimum-image shift grids depend only on the spatial dimension; build
+# them once at module scope as host arrays.
+_SHIFTS = {
+  dim: onp.stack(
+    onp.meshgrid(*([onp.arange(-1, 2)] * dim), indexing='ij'),
+    axis=-1).reshape(-1, dim).astype(onp.float32)
+  for dim in SPATIAL_DIMENSION
+}
+
+
+def _assert_allclose(x, y):
+  """Compares arrays on the host, avoiding a JAX dispatch per assert."""
+  x = onp.asarray(x)
+  y = onp.asarray(y)
+  tol = 5e-13 if x.dtype == onp.float64 else 5e-5
+  onp.testing.assert_allclose(x, y, atol=tol, rtol=tol)
+
+
+def _reference_min_image(dR, shifts):
+  """Host-side minimum-image reference; arrays this small are faster in
+  NumPy than through the JAX dispatch stack."""
+  dR = onp.asarray(dR)
+  dR_shifted = dR[None, :, :, :] + shifts[:, None, None, :]
+  dr_shifted = onp.sqrt(onp.sum(dR_shifted ** 2, axis=-1))
+  idx = onp.argmin(dr_shifted, axis=0)
+  return onp.take_along_axis(dR_shifted, idx[None, :, :, None], axis=0)[0]
+
+
+@jit
+def _transform_roundtrip(T, R):
+  return space.transform(space._small_inverse(T), space.transform(T, R))
+
+
+@partial(jit, static_argnums=(0,))
+def _static_periodic_displacement(box_size, dR):
+  """Wraps displacements with the box size as a compile-time constant."""
+  return space.periodic_displacement(box_size, dR)
+
+
+@jit
+def _shift_roundtrip(R, dR):
+  dR = np.clip(dR, f32(-0.49), f32(0.49))
+  R_shift = space.periodic_shift(f32(1.0), R, dR)
+  dR_after = space.periodic_displacement(f32(1.0), R_shift - R)
+  return R_shift, dR, dR_after
+
+
+# Jitted wrappers around the periodic spaces that take the box / transform as
+# a runtime argument, so one compiled executable serves every stochastic
+# sample rather than retracing per-sample closures.
+
+
+@jit
+def _periodic_disp(box_size, Ra, Rb):
+  disp_fn, _ = space.periodic(box_size)
+  return space.map_product(disp_fn)(Ra, Rb)
+
+
+@jit
+def _periodic_shift(box_size, R, dR):
+  _, shift_fn = space.periodic(box_size)
+  return shift_fn(R, dR)
+
+
+@jit
+def _general_disp(T, Ra, Rb):
+  disp_fn, _ = space.periodic_general(T)
+  return space.map_product(disp_fn)(Ra, Rb)
+
+
+@jit
+def _general_shift(T, R, dR):
+  _, shift_fn = space.periodic_general(T)
+  return shift_fn(R, dR)
+
+
+def _interpolate_transform(Ts, t):
+  return t * Ts[0] + (f32(1.0) - t) * Ts[1]
+
+
+_eval_transform = jit(_interpolate_transform)
+
+
+@jit
+def _general_disp_t(Ts, t, Ra, Rb):
+  disp_fn, _ = space.periodic_general(partial(_interpolate_transform, Ts))
+  return space.map_product(partial(disp_fn, t=t))(Ra, Rb)
+
+
+@jit
+def _general_shift_t(Ts, t, R, dR):
+  _, shift_fn = space.periodic_general(partial(_interpolate_transform, Ts))
+  return shift_fn(R, dR, t=t)
+
+
 # pylint: disable=invalid-name
 class SpaceTest(jtu.JaxTestCase):
 
   def test_small_inverse(self):
-    key = random.PRNGKey(0)
+    keys = KEYS[:STOCHASTIC_SAMPLES]
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split = random.split(key)
-      mat = random.normal(split, (2, 2))
+    for i in range(STOCHASTIC_SAMPLES):
+      mat = onp.asarray(random.normal(keys[i], (2, 2)))
 
       inv_mat = space._small_inverse(mat)
-      inv_mat_real_onp = onp.linalg.inv(mat)
-      inv_mat_real_np = np.linalg.inv(mat)
-      self.assertAllClose(inv_mat, inv_mat_real_onp)
-      self.assertAllClose(inv_mat, inv_mat_real_np)
+
+      # Closed-form adjugate inverse; linalg.inv has a large fixed overhead
+      # for matrices this small.
+      det = mat[0, 0] * mat[1, 1] - mat[0, 1] * mat[1, 0]
+      inv_mat_real = onp.array(
+        [[mat[1, 1], -mat[0, 1]], [-mat[1, 0], mat[0, 0]]]) / det
+
+      _assert_allclose(inv_mat, inv_mat_real)
 
   # pylint: disable=g-complex-comprehension
   @parameterized.named_parameters(jtu.cases_from_list(
@@ -76,20 +179,18 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_transform(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    keys = np.reshape(
+      KEYS[:2 * STOCHASTIC_SAMPLES], (STOCHASTIC_SAMPLES, 2, 2))
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2 = random.split(key, 3)
+    R = vmap(lambda key: random.normal(
+      key, (PARTICLE_COUNT, spatial_dimension), dtype=dtype))(keys[:, 0])
+    T = vmap(lambda key: random.normal(
+      key, (spatial_dimension, spatial_dimension), dtype=dtype))(keys[:, 1])
 
-      R = random.normal(
-        split1, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
-      T = random.normal(
-        split2, (spatial_dimension, spatial_dimension), dtype=dtype)
+    R_prime_exact = np.array(np.einsum('snd,sde->sne', R, T), dtype=dtype)
+    R_prime = vmap(space.transform)(T, R)
 
-      R_prime_exact = np.array(np.dot(R, T), dtype=dtype)
-      R_prime = space.transform(T, R)
-
-      self.assertAllClose(R_prime_exact, R_prime)
+    _assert_allclose(R_prime_exact, R_prime)
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -97,11 +198,10 @@ class SpaceTest(jtu.JaxTestCase):
           'spatial_dimension': dim
       } for dim in SPATIAL_DIMENSION))
   def test_transform_grad(self, spatial_dimension):
-    key = random.PRNGKey(0)
-
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2 = random.split(key, 3)
+    keys = np.reshape(
+      KEYS[:2 * STOCHASTIC_SAMPLES], (STOCHASTIC_SAMPLES, 2, 2))
 
+    def sample_grads(split1, split2):
       R = random.normal(split1, (PARTICLE_COUNT, spatial_dimension))
       T = random.normal(split2, (spatial_dimension, spatial_dimension))
 
@@ -110,10 +210,12 @@ class SpaceTest(jtu.JaxTestCase):
       energy_direct = lambda R: np.sum(R ** 2)
       energy_indirect = lambda T, R: np.sum(space.transform(T, R) ** 2)
 
-      grad_direct = grad(energy_direct)(R_prime)
-      grad_indirect = grad(energy_indirect, 1)(T, R)
+      return grad(energy_direct)(R_prime), grad(energy_indirect, 1)(T, R)
+
+    grad_direct, grad_indirect = jit(vmap(sample_grads))(
+      keys[:, 0], keys[:, 1])
 
-      self.assertAllClose(grad_direct, grad_indirect)
+    _assert_allclose(grad_direct, grad_indirect)
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -122,25 +224,23 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_transform_inverse(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
-    
+    key_R, key_T = KEYS[0], KEYS[1]
+
+    Rs = random.normal(
+      key_R, (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension),
+      dtype=dtype)
+    Ts = random.normal(
+      key_T, (STOCHASTIC_SAMPLES, spatial_dimension, spatial_dimension),
+      dtype=dtype)
+
     tol = 1e-13
     if dtype is f32:
       tol = 1e-5
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2 = random.split(key, 3)
+    for i in range(STOCHASTIC_SAMPLES):
+      R_test = _transform_roundtrip(Ts[i], Rs[i])
 
-      R = random.normal(
-        split1, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
-
-      T = random.normal(
-        split2, (spatial_dimension, spatial_dimension), dtype=dtype)
-      T_inv = space._small_inverse(T)
-
-      R_test = space.transform(T_inv, space.transform(T, R))
-
-      self.assertAllClose(R, R_test)
+      _assert_allclose(Rs[i], R_test)
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -149,7 +249,9 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_canonicalize_displacement_or_metric(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    Rs = random.normal(
+      KEYS[0],
+      (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension), dtype=dtype)
 
     displacement, _ = space.periodic_general(np.eye(spatial_dimension))
     metric = space.metric(displacement)
@@ -158,13 +260,10 @@ class SpaceTest(jtu.JaxTestCase):
     metric = space.map_product(metric)
     test_metric = space.map_product(test_metric)
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2 = random.split(key, 3)
-
-      R = random.normal(
-        split1, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+    for i in range(STOCHASTIC_SAMPLES):
+      R = Rs[i]
 
-      self.assertAllClose(metric(R, R), test_metric(R, R))
+      _assert_allclose(metric(R, R), test_metric(R, R))
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -173,48 +272,22 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_periodic_displacement(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    Rs = random.uniform(
+      KEYS[0],
+      (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension), dtype=dtype)
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split = random.split(key)
+    shifts = _SHIFTS[spatial_dimension].astype(dtype)
 
-      R = random.uniform(
-        split, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+    for i in range(STOCHASTIC_SAMPLES):
+      R = Rs[i]
       dR = space.map_product(space.pairwise_displacement)(R, R)
 
-      dR_wrapped = space.periodic_displacement(f32(1.0), dR)
-
-      dR_direct = dR
-      dr_direct = space.distance(dR)
-      dr_direct = np.reshape(dr_direct, dr_direct.shape + (1,))
-
-      if spatial_dimension == 2:
-        for i in range(-1, 2):
-          for j in range(-1, 2):
-            dR_shifted = dR + np.array([i, j], dtype=R.dtype)
-
-            dr_shifted = space.distance(dR_shifted)
-            dr_shifted = np.reshape(dr_shifted, dr_shifted.shape + (1,))
-
-            dR_direct = np.where(dr_shifted < dr_direct, dR_shifted, dR_direct)
-            dr_direct = np.where(dr_shifted < dr_direct, dr_shifted, dr_direct)
-      elif spatial_dimension == 3:
-        for i in range(-1, 2):
-          for j in range(-1, 2):
-            for k in range(-1, 2):
-              dR_shifted = dR + np.array([i, j, k], dtype=R.dtype)
+      dR_wrapped = _static_periodic_displacement(1.0, dR)
 
-              dr_shifted = space.distance(dR_shifted)
-              dr_shifted = np.reshape(dr_shifted, dr_shifted.shape + (1,))
+      dR_direct = _reference_min_image(dR, shifts)
 
-              dR_direct = np.where(
-                  dr_shifted < dr_direct, dR_shifted, dR_direct)
-              dr_direct = np.where(
-                  dr_shifted < dr_direct, dr_shifted, dr_direct)
-
-      dR_direct = np.array(dR_direct, dtype=dR.dtype)
       assert dR_wrapped.dtype == dtype
-      self.assertAllClose(dR_wrapped, dR_direct)
+      _assert_allclose(dR_wrapped, dR_direct)
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -223,29 +296,35 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_periodic_shift(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    key = KEYS[0]
+
+    tol = 5e-13
+    if dtype is f32:
+      tol = 5e-5
+
+    def body_fn(i, state):
+      max_err, in_box = state
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2 = random.split(key, 3)
+      key_i = random.fold_in(key, i)
+      key_R, key_dR = random.split(key_i)
 
       R = random.uniform(
-        split1, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+        key_R, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
       dR = np.sqrt(f32(0.1)) * random.normal(
-          split2, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+        key_dR, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
 
-      dR = np.where(dR > 0.49, f32(0.49), dR)
-      dR = np.where(dR < -0.49, f32(-0.49), dR)
+      R_shift, dR, dR_after = _shift_roundtrip(R, dR)
 
-      R_shift = space.periodic_shift(f32(1.0), R, dR)
+      max_err = np.maximum(max_err, np.max(np.abs(dR_after - dR)))
+      in_box = in_box & np.all((R_shift < 1.0) & (R_shift > 0.0))
+      return max_err, in_box
 
-      assert R_shift.dtype == R.dtype
-      assert np.all(R_shift < 1.0)
-      assert np.all(R_shift > 0.0)
+    max_err, in_box = lax.fori_loop(
+      0, STOCHASTIC_SAMPLES, body_fn, (np.zeros((), dtype), True))
 
-      dR_after = space.periodic_displacement(f32(1.0), R_shift - R)
-
-      assert dR_after.dtype == R.dtype
-      self.assertAllClose(dR_after, dR)
+    assert max_err.dtype == dtype
+    assert max_err < tol
+    assert in_box
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -254,38 +333,39 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_periodic_against_periodic_general(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    key_box, key_R, key_dR = KEYS[0], KEYS[1], KEYS[2]
+
+    max_box_size = f32(10.0)
+    box_sizes = max_box_size * random.uniform(
+      key_box, (STOCHASTIC_SAMPLES, spatial_dimension), dtype=dtype)
+    Rs = random.uniform(
+      key_R, (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension),
+      dtype=dtype)
+    dRs = random.normal(
+      key_dR, (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension),
+      dtype=dtype)
 
     tol = 1e-13
     if dtype is f32:
       tol = 1e-5
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2, split3 = random.split(key, 4)
-
-      max_box_size = f32(10.0)
-      box_size = max_box_size * random.uniform(
-        split1, (spatial_dimension,), dtype=dtype)
+    for i in range(STOCHASTIC_SAMPLES):
+      box_size = box_sizes[i]
       transform = np.diag(box_size)
 
-      R = random.uniform(
-        split2, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+      R = Rs[i]
       R_scaled = R * box_size
 
-      dR = random.normal(
-        split3, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
-
-      disp_fn, shift_fn = space.periodic(box_size)
-      general_disp_fn, general_shift_fn = space.periodic_general(transform)
-
-      disp_fn = space.map_product(disp_fn)
-      general_disp_fn = space.map_product(general_disp_fn)
+      dR = dRs[i]
 
-      self.assertAllClose(disp_fn(R_scaled, R_scaled), general_disp_fn(R, R))
-      assert disp_fn(R_scaled, R_scaled).dtype == dtype
-      self.assertAllClose(
-          shift_fn(R_scaled, dR), general_shift_fn(R, dR) * box_size)
-      assert shift_fn(R_scaled, dR).dtype == dtype
+      _assert_allclose(
+          _periodic_disp(box_size, R_scaled, R_scaled),
+          _general_disp(transform, R, R))
+      assert _periodic_disp(box_size, R_scaled, R_scaled).dtype == dtype
+      _assert_allclose(
+          _periodic_shift(box_size, R_scaled, dR),
+          _general_shift(transform, R, dR) * box_size)
+      assert _periodic_shift(box_size, R_scaled, dR).dtype == dtype
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -294,27 +374,26 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_periodic_against_periodic_general_grad(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    key_box, key_R = KEYS[0], KEYS[1]
+
+    max_box_size = f32(10.0)
+    box_sizes = max_box_size * random.uniform(
+      key_box, (STOCHASTIC_SAMPLES, spatial_dimension), dtype=dtype)
+    Rs = random.uniform(
+      key_R, (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension),
+      dtype=dtype)
 
     tol = 1e-13
     if dtype is f32:
       tol = 1e-5
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split1, split2, split3 = random.split(key, 4)
-
-      max_box_size = f32(10.0)
-      box_size = max_box_size * random.uniform(
-        split1, (spatial_dimension,), dtype=dtype)
+    for i in range(STOCHASTIC_SAMPLES):
+      box_size = box_sizes[i]
       transform = np.diag(box_size)
 
-      R = random.uniform(
-        split2, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+      R = Rs[i]
       R_scaled = R * box_size
 
-      dR = random.normal(
-        split3, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
-
       disp_fn, shift_fn = space.periodic(box_size)
       general_disp_fn, general_shift_fn = space.periodic_general(transform)
 
@@ -324,7 +403,7 @@ class SpaceTest(jtu.JaxTestCase):
       grad_fn = grad(lambda R: np.sum(disp_fn(R, R) ** 2)) 
       general_grad_fn = grad(lambda R: np.sum(general_disp_fn(R, R) ** 2)) 
 
-      self.assertAllClose(grad_fn(R_scaled), general_grad_fn(R))
+      _assert_allclose(grad_fn(R_scaled), general_grad_fn(R))
       assert general_grad_fn(R).dtype == dtype
 
   @parameterized.named_parameters(jtu.cases_from_list(
@@ -334,46 +413,48 @@ class SpaceTest(jtu.JaxTestCase):
           'dtype': dtype,
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_periodic_general_time_dependence(self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    (key_T0_scale, key_T0_dT, key_T1_scale, key_T1_dT,
+     key_t, key_R, key_dR) = KEYS[:7]
 
     eye = np.eye(spatial_dimension)
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split_T0_scale, split_T0_dT = random.split(key, 3)
-      key, split_T1_scale, split_T1_dT = random.split(key, 3)
-      key, split_t, split_R, split_dR = random.split(key, 4)
+    sizes_0 = 10.0 * random.uniform(key_T0_scale, (STOCHASTIC_SAMPLES,))
+    dtransforms_0 = 0.5 * random.normal(
+      key_T0_dT, (STOCHASTIC_SAMPLES, spatial_dimension, spatial_dimension))
 
-      size_0 = 10.0 * random.uniform(split_T0_scale, ())
-      dtransform_0 = 0.5 * random.normal(
-        split_T0_dT, (spatial_dimension, spatial_dimension))
-      T_0 = np.array(size_0 * (eye + dtransform_0), dtype=dtype)
+    sizes_1 = 10.0 * random.uniform(
+      key_T1_scale, (STOCHASTIC_SAMPLES,), dtype=dtype)
+    dtransforms_1 = 0.5 * random.normal(
+      key_T1_dT, (STOCHASTIC_SAMPLES, spatial_dimension, spatial_dimension),
+      dtype=dtype)
 
-      size_1 = 10.0 * random.uniform(split_T1_scale, (), dtype=dtype)
-      dtransform_1 = 0.5 * random.normal(
-          split_T1_dT, (spatial_dimension, spatial_dimension), dtype=dtype)
-      T_1 = np.array(size_1 * (eye + dtransform_1), dtype=dtype)
+    ts = random.uniform(key_t, (STOCHASTIC_SAMPLES,), dtype=dtype)
+    Rs = random.uniform(
+      key_R, (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension),
+      dtype=dtype)
+    dRs = random.normal(
+      key_dR, (STOCHASTIC_SAMPLES, PARTICLE_COUNT, spatial_dimension),
+      dtype=dtype)
 
-      T = lambda t: t * T_0 + (f32(1.0) - t) * T_1
+    for i in range(STOCHASTIC_SAMPLES):
+      T_0 = np.array(sizes_0[i] * (eye + dtransforms_0[i]), dtype=dtype)
+      T_1 = np.array(sizes_1[i] * (eye + dtransforms_1[i]), dtype=dtype)
 
-      t_g = random.uniform(split_t, (), dtype=dtype)
+      Ts = np.stack([T_0, T_1])
 
-      disp_fn, shift_fn = space.periodic_general(T)
-      true_disp_fn, true_shift_fn = space.periodic_general(T(t_g))
+      t_g = ts[i]
 
-      disp_fn = partial(disp_fn, t=t_g)
+      T_t = np.array(_eval_transform(Ts, t_g), dtype=dtype)
 
-      disp_fn = space.map_product(disp_fn)
-      true_disp_fn = space.map_product(true_disp_fn)
-
-      R = random.uniform(
-        split_R, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
-      dR = random.normal(
-        split_dR, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
+      R = Rs[i]
+      dR = dRs[i]
 
-      self.assertAllClose(
-        disp_fn(R, R), np.array(true_disp_fn(R, R), dtype=dtype))
-      self.assertAllClose(
-        shift_fn(R, dR, t=t_g), np.array(true_shift_fn(R, dR), dtype=dtype))
+      _assert_allclose(
+        _general_disp_t(Ts, t_g, R, R),
+        np.array(_general_disp(T_t, R, R), dtype=dtype))
+      _assert_allclose(
+        _general_shift_t(Ts, t_g, R, dR),
+        np.array(_general_shift(T_t, R, dR), dtype=dtype))
 
   @parameterized.named_parameters(jtu.cases_from_list(
       {
@@ -383,7 +464,7 @@ class SpaceTest(jtu.JaxTestCase):
       } for dim in SPATIAL_DIMENSION for dtype in POSITION_DTYPE))
   def test_periodic_general_wrapped_vs_unwrapped(
       self, spatial_dimension, dtype):
-    key = random.PRNGKey(0)
+    key = KEYS[0]
 
     eye = np.eye(spatial_dimension, dtype=dtype)
 
@@ -391,8 +472,10 @@ class SpaceTest(jtu.JaxTestCase):
     if dtype is f32:
       tol = 2e-5
 
-    for _ in range(STOCHASTIC_SAMPLES):
-      key, split_R, split_T = random.split(key, 3)
+    for i in range(STOCHASTIC_SAMPLES):
+      sample_key = random.fold_in(key, i)
+      split_R = random.fold_in(sample_key, 0)
+      split_T = random.fold_in(sample_key, 1)
 
       dT = random.normal(
         split_T, (spatial_dimension, spatial_dimension), dtype=dtype)
@@ -408,13 +491,13 @@ class SpaceTest(jtu.JaxTestCase):
 
       displacement = space.map_product(displacement)
 
-      for _ in range(SHIFT_STEPS):
-        key, split = random.split(key)
+      for step in range(SHIFT_STEPS):
+        split = random.fold_in(sample_key, 2 + step)
         dR = random.normal(
           split, (PARTICLE_COUNT, spatial_dimension), dtype=dtype)
         R = shift(R, dR)
         unwrapped_R = unwrapped_shift(unwrapped_R, dR)
-        self.assertAllClose(
+        _assert_allclose(
           displacement(R, R0),
           displacement(unwrapped_R, R0))
       assert not (np.all(unwrapped_R > 0) and np.all(unwrapped_R < 1))